@@ -1,10 +1,20 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from openai import OpenAI
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from typing import Optional
 import streamlit as st
 from dotenv import load_dotenv
+import ciso8601
+import hashlib
+import html
+import math
+import threading
+import time
+import orjson
 import os
 
 # ===============================
@@ -43,27 +53,50 @@ if not OPENAI_API_KEY or not NEWS_API_KEY:
     st.stop()
 
 NEWS_API_URL = "https://cryptonewsapi.online/api/v1/news"
+PAGE_SIZE = 20
+MAX_PAGES = 5
+POOL_MAXSIZE = MAX_PAGES
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+
+@st.cache_resource
+def get_openai_client():
+    # dibuat sekali lalu dipakai ulang di semua rerun, hanya saat analisis benar-benar dijalankan
+    return OpenAI(api_key=OPENAI_API_KEY)
 
 
 # ===============================
 # FETCH NEWS FUNCTION
 # ===============================
-def fetch_crypto_news(query: NewsQuery):
-    headers = {"X-API-Key": NEWS_API_KEY}
+@st.cache_resource
+def get_news_session():
+    # dibuat sekali per proses (bukan tiap rerun) agar koneksi TLS keep-alive bisa dipakai ulang
+    session = requests.Session()
+    session.headers.update({"X-API-Key": NEWS_API_KEY})
+    adapter = HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            # Retry-After dari server tidak dipatuhi agar jeda tetap mengikuti backoff singkat
+            respect_retry_after_header=False
+        )
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+def _fetch_page(session: requests.Session, language: Optional[str], per_page: int, page: int):
     params = {
-        "items": query.limit,
-        "page": query.page,
-        "language": query.language.value if query.language else None
+        "items": per_page,
+        "page": page,
+        "language": language
     }
 
-    try:
-        response = requests.get(NEWS_API_URL, headers=headers, params=params)
-        data = response.json()
-    except Exception as e:
-        st.error(f"❌ Error fetching news: {e}")
-        return get_mock_articles()
+    response = session.get(NEWS_API_URL, params=params, timeout=(3.05, 10))
+    data = orjson.loads(response.content)
 
     articles = []
     if isinstance(data, dict):
@@ -73,11 +106,59 @@ def fetch_crypto_news(query: NewsQuery):
             else []
         )
 
-    if not articles or not isinstance(articles, list):
+    return articles if isinstance(articles, list) else []
+
+
+class NoArticlesError(Exception):
+    pass
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_crypto_news(language: Optional[str], limit: int, page: int):
+    # gagal/kosong di-raise, bukan di-return, supaya st.cache_data hanya menyimpan artikel asli
+    per_page = min(limit, PAGE_SIZE)
+    pages = range(page, page + min(math.ceil(limit / per_page), MAX_PAGES))
+
+    # semua halaman diambil paralel sekaligus, total waktu ≈ request paling lambat
+    # session diambil di thread script (bukan di worker) agar cache_resource punya ScriptRunContext
+    session = get_news_session()
+    articles = []
+    executor = ThreadPoolExecutor(max_workers=len(pages))
+    try:
+        futures = [executor.submit(_fetch_page, session, language, per_page, p) for p in pages]
+        for future in futures:
+            result = future.result()
+            articles.extend(result)
+            # halaman yang tidak penuh berarti feed habis; halaman sesudahnya dibuang
+            if len(result) < per_page:
+                break
+    finally:
+        # saat error atau feed habis, sisa request tidak ditunggu
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not articles:
+        raise NoArticlesError()
+
+    return articles[:limit]
+
+
+def fetch_crypto_news(query: NewsQuery):
+    # dipanggil di luar cache: is_mock selalu mencerminkan hasil request saat ini,
+    # jadi begitu API pulih, refresh berikutnya langsung memakai artikel asli + analisis
+    try:
+        articles = _fetch_crypto_news(
+            query.language.value if query.language else None,
+            query.limit,
+            query.page
+        )
+    except NoArticlesError:
         st.warning("Tidak ada artikel ditemukan, menggunakan mock article.")
-        return get_mock_articles()
+        return get_mock_articles(), True
+    except Exception as e:
+        st.error(f"❌ Error fetching news: {e}")
+        return get_mock_articles(), True
 
-    return articles[:query.limit]
+    return articles, False
 
 
 # ===============================
@@ -102,30 +183,273 @@ def get_mock_articles():
     ]
 
 
+# ===============================
+# FORMAT DATE FUNCTION
+# ===============================
+def _fmt_date(pub_date: str) -> str:
+    if not pub_date:
+        return pub_date
+    try:
+        return ciso8601.parse_datetime(pub_date).strftime("%d %b %Y, %H:%M")
+    except (TypeError, ValueError):
+        return pub_date
+
+
+# ===============================
+# PARSED ARTICLES
+# ===============================
+def _source_name(source):
+    return source.get("name") if isinstance(source, dict) else None
+
+
+class ParsedArticles:
+    # satu kali parsing (struct of arrays) dipakai bersama oleh render dan analisis
+    # nilai null dari API dinormalisasi ke str di sini, sehingga render & analisis selalu menerima str
+    def __init__(self, articles: list):
+        self.titles = [str(a.get("title") or "Tanpa Judul") for a in articles]
+        self.descs = [str(a.get("description") or "") for a in articles]
+        self.dates = [_fmt_date(str(a.get("pubDate") or "")) for a in articles]
+        self.sources = [str(_source_name(a.get("source")) or "Unknown Source") for a in articles]
+        self.links = [str(a.get("link") or "#") for a in articles]
+
+
+# ===============================
+# RENDER CARD FUNCTION
+# ===============================
+def _escape_fields(*fields):
+    return [html.escape(field) for field in fields]
+
+
+def _render_card(title, desc, pub_date, source, link):
+    title, desc, pub_date, source, link = _escape_fields(title, desc, pub_date, source, link)
+
+    return f"""
+        <div class="news-card">
+            <div class="news-title">{title}</div>
+            <div class="news-date">🕓 {pub_date} | 📰 {source}</div>
+            <div class="news-desc">{desc}</div>
+            <div class="news-link"><a href="{link}" target="_blank">🔗 Baca Artikel</a></div>
+        </div>
+    """.strip()
+
+
+def _render_highlight(title, desc, pub_date, source, link):
+    title, desc, pub_date, source, link = _escape_fields(title, desc, pub_date, source, link)
+
+    return f"""
+        <div class="highlight-card">
+            <div class="highlight-meta">🕓 {pub_date} | 📰 {source}</div>
+            <div class="highlight-title">{title}</div>
+            <div class="highlight-desc">{desc}</div>
+            <div class="highlight-link">
+                <a href="{link}" target="_blank">🔗 Baca Selengkapnya</a>
+            </div>
+        </div>
+    """.strip()
+
+
 # ===============================
 # ANALYZE NEWS FUNCTION
 # ===============================
-def analyze_market(articles):
-    combined_text = ""
-    for art in articles:
-        combined_text += f"{art.get('title','')}\n{art.get('description','')}\n\n"
-
-    prompt = f"""
-    Berdasarkan berita crypto terbaru berikut, berikan analisis singkat untuk market crypto:
-    - Sentimen pasar (Bullish / Bearish / Netral)
-    - Tren umum (naik / turun / stabil)
-    - Saran singkat (Buy / Hold / Watch)
-    Jawab dengan jelas, mudah dipahami, dan tampilkan dengan format yang rapi dan profesional.
-
-    Berita:
-    {combined_text}
-    """
+# Prompt statis diletakkan di awal pesan (role system) dan dibuat > 1024 token
+# agar prefix-nya selalu kena prompt caching otomatis dari OpenAI.
+STATIC_SYSTEM_PROMPT = """
+Kamu adalah analis pasar crypto senior yang menulis ringkasan harian untuk investor ritel di Indonesia.
+Tugasmu: membaca kumpulan berita crypto terbaru yang diberikan oleh user, lalu menyusun analisis singkat
+untuk market crypto secara keseluruhan. Jawab selalu dalam Bahasa Indonesia, walaupun berita aslinya
+berbahasa Inggris atau Mandarin.
+
+=== YANG HARUS DINILAI ===
+1. Sentimen pasar: pilih tepat satu dari Bullish / Bearish / Netral.
+2. Tren umum: pilih tepat satu dari naik / turun / stabil.
+3. Saran singkat: pilih tepat satu dari Buy / Hold / Watch.
+
+=== RUBRIK SENTIMEN ===
+- Bullish: mayoritas berita membawa katalis positif, misalnya kenaikan harga yang signifikan, arus dana
+  masuk ke ETF, adopsi institusional, regulasi yang lebih jelas dan bersahabat, upgrade jaringan yang
+  berhasil, atau pertumbuhan aktivitas on-chain.
+- Bearish: mayoritas berita membawa katalis negatif, misalnya penurunan harga tajam, likuidasi besar,
+  peretasan atau eksploit, gugatan dan tindakan keras regulator, arus dana keluar dari ETF, atau
+  kebangkrutan perusahaan crypto.
+- Netral: berita positif dan negatif seimbang, berita bersifat informatif tanpa dampak harga yang jelas,
+  atau jumlah berita terlalu sedikit untuk menarik kesimpulan yang kuat.
+Jika ragu antara dua kategori, pilih Netral dan jelaskan alasannya secara singkat.
+
+=== RUBRIK TREN ===
+- naik: berita menyebut harga aset utama (BTC, ETH) menguat, volume meningkat, atau breakout level penting.
+- turun: berita menyebut harga aset utama melemah, volume jual dominan, atau level support ditembus.
+- stabil: harga bergerak sideways, perubahan kecil, atau berita tidak membahas pergerakan harga.
+
+=== RUBRIK SARAN ===
+- Buy: sentimen Bullish dan tren naik dengan katalis yang jelas dan berkelanjutan.
+- Hold: kondisi campuran, atau tren positif tetapi risiko jangka pendek masih tinggi.
+- Watch: sentimen Bearish, ketidakpastian tinggi, atau informasi belum cukup untuk mengambil posisi.
+Saran bersifat edukatif, bukan nasihat keuangan. Jangan pernah menjanjikan keuntungan dan jangan
+menyebut target harga yang spesifik.
+
+=== ATURAN PENULISAN ===
+- Gunakan bahasa yang jelas, mudah dipahami, rapi, dan profesional.
+- Jangan mengarang fakta, angka, atau nama yang tidak ada di dalam berita.
+- Sebutkan aset atau proyek yang paling banyak dibahas bila relevan.
+- Setiap poin alasan maksimal satu kalimat; total jawaban maksimal sekitar 200 kata.
+- Jangan menyalin ulang judul berita secara utuh; ringkas maknanya.
+- Jangan menambahkan pembuka seperti "Berikut analisisnya" atau penutup basa-basi.
+- Gunakan format Markdown persis seperti template di bawah ini.
+
+=== TEMPLATE JAWABAN ===
+**Sentimen Pasar:** <Bullish / Bearish / Netral>
+**Tren Umum:** <naik / turun / stabil>
+**Saran Singkat:** <Buy / Hold / Watch>
+
+**Alasan Utama:**
+- <alasan 1>
+- <alasan 2>
+- <alasan 3, opsional>
+
+**Risiko yang Perlu Diperhatikan:**
+- <risiko 1>
+- <risiko 2, opsional>
+
+**Kesimpulan:** <satu sampai dua kalimat ringkasan>
+
+=== CONTOH 1 (Bullish) ===
+Berita:
+Bitcoin Tembus Rekor Baru
+Harga Bitcoin naik 6% dalam 24 jam setelah arus dana masuk ke ETF spot mencapai level tertinggi bulan ini.
+Bank Besar Luncurkan Layanan Kustodi Crypto
+Sebuah bank global mulai menawarkan penyimpanan aset digital untuk nasabah institusional.
+
+Jawaban:
+**Sentimen Pasar:** Bullish
+**Tren Umum:** naik
+**Saran Singkat:** Buy
+
+**Alasan Utama:**
+- Arus dana ETF yang tinggi menunjukkan permintaan institusional yang kuat.
+- Masuknya bank besar ke layanan kustodi memperkuat kepercayaan terhadap aset digital.
+
+**Risiko yang Perlu Diperhatikan:**
+- Kenaikan cepat berpotensi diikuti aksi ambil untung jangka pendek.
+
+**Kesimpulan:** Katalis institusional mendorong pasar menguat, namun tetap perhatikan volatilitas setelah rekor baru.
+
+=== CONTOH 2 (Bearish) ===
+Berita:
+Exchange Terkena Peretasan Senilai Ratusan Juta Dolar
+Peretas menguras dompet panas sebuah exchange besar, penarikan dana dihentikan sementara.
+Regulator Gugat Proyek Staking
+Regulator menuduh layanan staking melanggar aturan sekuritas.
+
+Jawaban:
+**Sentimen Pasar:** Bearish
+**Tren Umum:** turun
+**Saran Singkat:** Watch
+
+**Alasan Utama:**
+- Peretasan exchange besar menekan kepercayaan pengguna dan memicu tekanan jual.
+- Gugatan regulator terhadap staking menambah ketidakpastian hukum.
+
+**Risiko yang Perlu Diperhatikan:**
+- Potensi efek domino jika exchange lain ikut menghentikan penarikan.
+
+**Kesimpulan:** Tekanan negatif dari sisi keamanan dan regulasi membuat pasar lebih baik dipantau dulu.
+
+=== CONTOH 3 (Netral) ===
+Berita:
+Ethereum Umumkan Jadwal Upgrade Berikutnya
+Pengembang menetapkan tanggal uji coba testnet untuk upgrade jaringan berikutnya.
+Harga Bitcoin Bergerak Datar
+Bitcoin bergerak dalam rentang sempit sementara pasar menunggu data inflasi.
+
+Jawaban:
+**Sentimen Pasar:** Netral
+**Tren Umum:** stabil
+**Saran Singkat:** Hold
+
+**Alasan Utama:**
+- Jadwal upgrade Ethereum bersifat informatif dan belum berdampak langsung pada harga.
+- Bitcoin sideways karena pelaku pasar menunggu data makro.
+
+**Risiko yang Perlu Diperhatikan:**
+- Data inflasi yang di luar ekspektasi bisa memicu pergerakan tajam ke dua arah.
+
+**Kesimpulan:** Pasar sedang menunggu katalis baru, sehingga posisi yang ada cukup dipertahankan.
+
+=== INPUT ===
+Pesan dari user berisi daftar berita dengan format: judul di baris pertama, deskripsi di baris kedua,
+dan setiap berita dipisahkan satu baris kosong. Analisis seluruh berita tersebut sekaligus, lalu jawab
+hanya dengan format template di atas.
+"""
+
+
+def analyze_market(titles, descs):
+    combined_text = "\n\n".join(
+        f"{title}\n{desc}" for title, desc in zip(titles, descs)
+    )
+
+    digest = hashlib.sha256(combined_text.encode()).hexdigest()
+    summaries = get_summary_cache()
+    cached = summaries.get(digest)
+    if cached is not None:
+        yield cached
+        return
 
-    response = client.chat.completions.create(
+    stream = get_openai_client().chat.completions.create(
         model="gpt-5-nano",
-        messages=[{"role": "user", "content": prompt}]
+        messages=[
+            {"role": "system", "content": STATIC_SYSTEM_PROMPT},
+            {"role": "user", "content": combined_text}
+        ],
+        stream=True
     )
-    return response.choices[0].message.content.strip()
+
+    chunks = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content or ""
+        chunks.append(text)
+        yield text
+
+    summary = "".join(chunks).strip()
+    # jawaban kosong tidak disimpan supaya refresh berikutnya mencoba ulang
+    if summary:
+        summaries.put(digest, summary)
+
+
+class SummaryCache:
+    # digest artikel -> ringkasan, dengan TTL per entri dan batas jumlah entri (LRU).
+    # Dipakai bersama lintas sesi, jadi setiap akses dijaga lock.
+    def __init__(self, ttl: float = 3600, max_entries: int = 128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            stored_at, summary = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return summary
+
+    def put(self, digest: str, summary: str):
+        with self._lock:
+            self._entries[digest] = (time.monotonic(), summary)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource(show_spinner=False)
+def get_summary_cache():
+    # satu instance per proses, dibuat sekali dan dipakai ulang di semua rerun
+    return SummaryCache()
 
 
 # ===============================
@@ -134,8 +458,7 @@ def analyze_market(articles):
 st.set_page_config(page_title="Crypto Market Insight", page_icon="💹", layout="wide")
 
 # ========== STYLE ==========
-st.markdown(
-    """
+CSS = """
     <style>
         body {
             background: linear-gradient(160deg, #0f0f0f 0%, #1a1a1a 40%, #0b0b0b 100%);
@@ -306,100 +629,95 @@ st.markdown(
             color: #4ade80;
         }
     </style>
-    """,
-    unsafe_allow_html=True
-)
+    """
+
 
 # ===============================
 # HEADER + FILTER (di tengah)
 # ===============================
-st.markdown(
-    """
+HEADER_HTML = """
     <div class="header-section">
         <div class="header-title">💹 Crypto Market Insight</div>
         <div class="header-subtitle">Berita dan analisis pasar crypto terkini berbasis AI</div>
     </div>
-    """,
-    unsafe_allow_html=True
-)
-
-# Buat filter input di tengah
-col_empty1, col_center, col_empty2 = st.columns([1, 3, 1])
-with col_center:
-    col1, col2 = st.columns([2, 1])
-    with col1:
-        lang = st.selectbox("Bahasa Berita", ["English", "Chinese"], key="lang_select")
-    with col2:
-        limit = st.text_input("Jumlah berita", "5", key="limit_input")
-
-try:
-    limit = int(limit)
-    if limit < 1:
-        limit = 5
-except ValueError:
-    limit = 5
-
-query = NewsQuery(limit=limit, language=Language.EN if lang == "English" else Language.ZH)
+"""
+
+# CSS + header dikirim sebagai satu elemen
+st.html(CSS + HEADER_HTML)
+
+
+# Filter, tombol, dan daftar berita berada di dalam fragment: interaksi widget
+# hanya me-rerun bagian ini, bukan CSS + header di atas.
+@st.fragment
+def render_news():
+    # Buat filter input di tengah
+    col_empty1, col_center, col_empty2 = st.columns([1, 3, 1])
+    with col_center:
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            lang = st.selectbox("Bahasa Berita", ["English", "Chinese"], key="lang_select")
+        with col2:
+            limit = st.text_input("Jumlah berita", "5", key="limit_input")
+        fetch_clicked = st.button("🔄 Ambil & Analisis Berita", key="fetch_button")
 
-st.markdown("<hr>", unsafe_allow_html=True)
-
-# ===============================
-# FETCH NEWS & DISPLAY
-# ===============================
-articles = fetch_crypto_news(query)
-
-if articles:
-    top = articles[0]
-    pub_date = top.get("pubDate", "")
-    if pub_date:
-        try:
-            pub_date = datetime.strptime(pub_date[:19], "%Y-%m-%dT%H:%M:%S").strftime("%d %b %Y, %H:%M")
-        except:
-            pass
-
-    st.markdown(f"""
-        <div class="highlight-card">
-            <div class="highlight-meta">🕓 {pub_date} | 📰 {top.get('source', {}).get('name', 'Unknown')}</div>
-            <div class="highlight-title">{top.get('title', 'Tanpa Judul')}</div>
-            <div class="highlight-desc">{top.get('description', '')}</div>
-            <div class="highlight-link">
-                <a href="{top.get('link', '#')}" target="_blank">🔗 Baca Selengkapnya</a>
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
-
-    st.subheader("🗞️ Berita Lainnya")
-
-    for art in articles[1:]:
-        title = art.get("title", "Tanpa Judul")
-        desc = art.get("description", "")
-        link = art.get("link", "#")
-        pub_date = art.get("pubDate", "")
-        source = art.get("source", {}).get("name", "Unknown Source")
-
-        if pub_date:
-            try:
-                pub_date = datetime.strptime(pub_date[:19], "%Y-%m-%dT%H:%M:%S").strftime("%d %b %Y, %H:%M")
-            except:
-                pass
-
-        st.markdown(f"""
-            <div class="news-card">
-                <div class="news-title">{title}</div>
-                <div class="news-date">🕓 {pub_date} | 📰 {source}</div>
-                <div class="news-desc">{desc}</div>
-                <div class="news-link"><a href="{link}" target="_blank">🔗 Baca Artikel</a></div>
-            </div>
-        """, unsafe_allow_html=True)
+    try:
+        limit = int(limit)
+        if limit < 1:
+            limit = 5
+    except ValueError:
+        limit = 5
+    limit = min(limit, MAX_PAGES * PAGE_SIZE)
 
-    st.divider()
+    query = NewsQuery(limit=limit, language=Language.EN if lang == "English" else Language.ZH)
 
     # ===============================
-    # ANALYSIS OUTPUT
+    # FETCH NEWS & DISPLAY
     # ===============================
-    st.subheader("📊 Ringkasan Analisis Pasar")
-    with st.spinner("Menganalisis berita..."):
-        summary = analyze_market(articles)
-        st.success(summary)
-else:
-    st.error("Tidak ada berita yang bisa ditampilkan saat ini.")
+    # fetch + analisis hanya jalan saat tombol ditekan; rerun lain memakai hasil di session_state
+    if fetch_clicked:
+        articles, st.session_state.is_mock = fetch_crypto_news(query)
+        st.session_state.news = ParsedArticles(articles)
+        st.session_state.pop("summary", None)
+
+    news = st.session_state.get("news")
+
+    # highlight, semua kartu, divider, dan subheader dirangkai jadi satu elemen HTML
+    html_parts = ["<hr>"]
+    if news is not None and news.titles:
+        html_parts += [
+            _render_highlight(news.titles[0], news.descs[0], news.dates[0], news.sources[0], news.links[0]),
+            "<h3>🗞️ Berita Lainnya</h3>",
+            *[
+                _render_card(*fields)
+                for fields in zip(news.titles[1:], news.descs[1:], news.dates[1:], news.sources[1:], news.links[1:])
+            ],
+            "<hr>",
+            "<h3>📊 Ringkasan Analisis Pasar</h3>",
+        ]
+    # st.markdown (bukan st.html) karena sanitizer st.html membuang target="_blank" pada link
+    st.markdown("".join(html_parts), unsafe_allow_html=True)
+
+    if news is None:
+        st.info("Pilih filter lalu tekan tombol \"Ambil & Analisis Berita\" untuk memuat berita.")
+    elif news.titles:
+        # ===============================
+        # ANALYSIS OUTPUT
+        # ===============================
+        if st.session_state.get("is_mock"):
+            st.info("Analisis dilewati karena berita yang ditampilkan adalah mock article.")
+        else:
+            if "summary" not in st.session_state:
+                placeholder = st.empty()
+                with placeholder.container(), st.spinner("Menganalisis berita..."):
+                    summary = st.write_stream(analyze_market(news.titles, news.descs))
+                st.session_state.summary = summary.strip() if isinstance(summary, str) else ""
+                placeholder.empty()
+            if st.session_state.summary:
+                st.success(st.session_state.summary)
+            else:
+                st.warning("Analisis tidak menghasilkan jawaban. Tekan \"Ambil & Analisis Berita\" untuk mencoba lagi.")
+    else:
+        st.error("Tidak ada berita yang bisa ditampilkan saat ini.")
+
+
+render_news()